@@ -1,22 +1,59 @@
+from collections import OrderedDict
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
+import asyncio
 import bcrypt
+import hashlib
+import hmac
 import secrets
 import os
 
 security = HTTPBasic()
 
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
-_admin_password = os.getenv("ADMIN_PASSWORD", "avhub2024").encode("utf-8")
-ADMIN_PASSWORD_HASH = bcrypt.hashpw(_admin_password, bcrypt.gensalt())
+# Prefer a precomputed bcrypt hash (ADMIN_PASSWORD_HASH) so each worker
+# doesn't hash the password at import; fall back to ADMIN_PASSWORD.
+_admin_password_hash = os.getenv("ADMIN_PASSWORD_HASH")
+if _admin_password_hash:
+    ADMIN_PASSWORD_HASH = _admin_password_hash.encode("utf-8")
+else:
+    _admin_password = os.getenv("ADMIN_PASSWORD", "avhub2024").encode("utf-8")
+    ADMIN_PASSWORD_HASH = bcrypt.hashpw(_admin_password, bcrypt.gensalt())
 
+# bcrypt results keyed by an HMAC of the submitted password, so repeat
+# admin requests skip the KDF without keeping plaintext passwords around.
+_CHECK_CACHE_SIZE = 128
+_check_cache_key = secrets.token_bytes(32)
+_check_cache: "OrderedDict[bytes, bool]" = OrderedDict()
 
-def verify_admin(credentials: HTTPBasicCredentials = Depends(security)):
-    correct_username = secrets.compare_digest(credentials.username, ADMIN_USERNAME)
-    correct_password = bcrypt.checkpw(
-        credentials.password.encode("utf-8"), ADMIN_PASSWORD_HASH
+
+async def _password_matches(password: bytes) -> bool:
+    """bcrypt-check a password against the admin hash, with an LRU cache.
+
+    Cache misses run bcrypt in a worker thread so the event loop keeps
+    serving other requests during the KDF.
+    """
+    key = hmac.new(_check_cache_key, password, hashlib.sha256).digest()
+    cached = _check_cache.get(key)
+    if cached is not None:
+        _check_cache.move_to_end(key)
+        return cached
+
+    ok = await asyncio.to_thread(bcrypt.checkpw, password, ADMIN_PASSWORD_HASH)
+    _check_cache[key] = ok
+    if len(_check_cache) > _CHECK_CACHE_SIZE:
+        _check_cache.popitem(last=False)
+    return ok
+
+
+async def verify_admin(credentials: HTTPBasicCredentials = Depends(security)):
+    # Evaluate both checks unconditionally so response timing does not
+    # reveal whether the username was correct.
+    correct_username = secrets.compare_digest(
+        credentials.username.encode("utf-8"), ADMIN_USERNAME.encode("utf-8")
     )
-    if not (correct_username and correct_password):
+    correct_password = await _password_matches(credentials.password.encode("utf-8"))
+    if not (correct_username & correct_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -0,0 +1,38 @@
+import functools
+import os
+import time
+
+# Read endpoints serve mostly static reference data, so results are kept
+# in-process for a short TTL and dropped whenever an admin edits anything.
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = 512
+
+_entries: dict = {}
+
+
+def cached(func):
+    """Cache an async endpoint's result, keyed by its non-``db`` arguments."""
+
+    @functools.wraps(func)
+    async def wrapper(**kwargs):
+        key = (func.__name__,) + tuple(
+            sorted((k, v) for k, v in kwargs.items() if k != "db")
+        )
+        now = time.monotonic()
+        hit = _entries.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+
+        result = await func(**kwargs)
+        if len(_entries) >= CACHE_MAX_ENTRIES:
+            # Dicts keep insertion order, so this drops the oldest entry
+            _entries.pop(next(iter(_entries)))
+        _entries[key] = (now + CACHE_TTL, result)
+        return result
+
+    return wrapper
+
+
+def invalidate_cache():
+    """Drop every cached result; called after any admin write."""
+    _entries.clear()
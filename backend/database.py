@@ -1,18 +1,62 @@
-from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from contextvars import ContextVar
 import os
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./av_hub.db")
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./av_hub.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Connections are pooled per worker process; size the pool to the worker's
+# expected concurrency. pre_ping costs a round trip per checkout to catch
+# connections the server has dropped, which a local SQLite file never does,
+# so it defaults on only for server databases (DB_POOL_PRE_PING=0/1).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+_IS_SQLITE = DATABASE_URL.startswith("sqlite")
+DB_POOL_PRE_PING = os.getenv(
+    "DB_POOL_PRE_PING", "0" if _IS_SQLITE else "1"
+) == "1"
+
+engine = create_async_engine(
+    DATABASE_URL,
+    # check_same_thread is a sqlite3 option; server drivers reject it
+    connect_args={"check_same_thread": False} if _IS_SQLITE else {},
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _enable_wal(dbapi_connection, connection_record):
+        # WAL lets readers proceed while an admin write is in progress
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+# Development aid: with QUERY_WARN_THRESHOLD set, the app logs requests
+# that run more statements than that, which usually means a query is being
+# issued once per row. query_counter holds the current request's count.
+QUERY_WARN_THRESHOLD = int(os.getenv("QUERY_WARN_THRESHOLD", "0"))
+query_counter: ContextVar = ContextVar("query_counter", default=None)
+
+if QUERY_WARN_THRESHOLD:
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        counter = query_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+SessionLocal = async_sessionmaker(
+    bind=engine, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,19 +1,35 @@
-import io
 import os
+import base64
+import binascii
 import csv
-import re
+import hashlib
+import io
+import inspect
+import logging
+import operator
 import pathlib
-from datetime import datetime
+import re
+from contextlib import asynccontextmanager
+from datetime import date
 from typing import Optional
 
-from fastapi import FastAPI, Depends, HTTPException, Query
+import orjson
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, FileResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, extract
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+from sqlalchemy import (
+    func, or_, extract, select, delete, literal, literal_column, table, column,
+    case, cast, true, tuple_, union_all, BigInteger, Date, DateTime, Integer,
+    String,
+)
 
-from database import engine, get_db, Base, SessionLocal
+from database import (
+    engine, get_db, Base, SessionLocal, QUERY_WARN_THRESHOLD, query_counter,
+)
 from models import (
     Policy,
     Deployment,
@@ -22,6 +38,9 @@ from models import (
     Resource,
     CurbsideRegulation,
     NewsArticle,
+    fts_table_name,
+    search_document,
+    upgrade_schema,
 )
 from schemas import (
     PolicyCreate,
@@ -41,208 +60,593 @@ from schemas import (
     DashboardSummary,
 )
 from auth import verify_admin
+from cache import cached, invalidate_cache
 from seed_data import seed_database
 
-app = FastAPI(title="AV Hub API", version="1.0.0")
+# ---------------------------------------------------------------------------
+# Lifespan - create tables on startup; optionally reset and seed
+# ---------------------------------------------------------------------------
+# Seeding normally happens once via `python seed.py`; every worker running
+# it on boot delays readiness and races the others' inserts.
+# RESET_DB=1 deletes the SQLite file first so a changed schema applies
+# cleanly; AVHUB_SEED=1 seeds on startup when the tables are empty.
+RESET_DB = os.getenv("RESET_DB") == "1"
+SEED_ON_STARTUP = os.getenv("AVHUB_SEED") == "1"
+
+
+async def init_db():
+    if RESET_DB:
+        db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "av_hub.db")
+        # Include the WAL sidecar files so stale pages aren't replayed
+        for path in (db_path, db_path + "-wal", db_path + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+    if SEED_ON_STARTUP:
+        async with SessionLocal() as db:
+            if await db.scalar(select(Policy.id).limit(1)) is None:
+                # The seed routines use the sync ORM API; run them on the
+                # session's underlying sync Session.
+                await db.run_sync(seed_database)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db()
+    yield
+    await engine.dispose()
+
+
+app = FastAPI(
+    title="AV Hub API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 # ---------------------------------------------------------------------------
-# CORS middleware - allow all origins for development
+# CORS middleware - allow the configured frontend origins
 # ---------------------------------------------------------------------------
+# Browsers reject a wildcard origin on credentialed requests, so origins are
+# listed explicitly (comma-separated in CORS_ORIGINS). The Vite dev server
+# proxies /api, so these only matter when the frontend is served elsewhere.
+CORS_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv(
+        "CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000"
+    ).split(",")
+    if origin.strip()
+]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
+    # Let browsers reuse a preflight result for a day
+    max_age=86400,
 )
 
+# ---------------------------------------------------------------------------
+# GZip middleware - compress JSON and streamed CSV responses
+# ---------------------------------------------------------------------------
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
 
 # ---------------------------------------------------------------------------
-# Startup event - create tables and seed data
+# Query-count warnings - development aid for spotting N+1 query patterns
 # ---------------------------------------------------------------------------
-@app.on_event("startup")
-def on_startup():
-    # Delete old database so the new schema applies cleanly
-    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "av_hub.db")
-    if os.path.exists(db_path):
-        os.remove(db_path)
-
-    Base.metadata.create_all(bind=engine)
-    db = SessionLocal()
-    try:
-        seed_database(db)
-    finally:
-        db.close()
+logger = logging.getLogger(__name__)
+
+if QUERY_WARN_THRESHOLD:
+    @app.middleware("http")
+    async def warn_on_query_storms(request: Request, call_next):
+        counter = [0]
+        query_counter.set(counter)
+        response = await call_next(request)
+        if counter[0] > QUERY_WARN_THRESHOLD:
+            logger.warning(
+                "%s %s ran %d queries", request.method, request.url.path, counter[0]
+            )
+        return response
 
 
 # ---------------------------------------------------------------------------
-# Utility: stream a list of dicts as CSV
+# Utility: stream query results as CSV
 # ---------------------------------------------------------------------------
-def _rows_to_csv(rows: list[dict], filename: str) -> StreamingResponse:
-    if not rows:
-        output = io.StringIO()
-        output.write("")
-        output.seek(0)
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+CSV_BATCH_SIZE = 1000
+
+
+def _export_columns(model):
+    """Table columns written to a model's CSV export.
+
+    Columns named in the model's ``internal_columns`` (derived values the
+    app keeps for itself) are left out.
+    """
+    internal = getattr(model, "internal_columns", ())
+    return [col for col in model.__table__.columns if col.name not in internal]
+
+
+def _stream_csv(stmt, columns, filename: str) -> StreamingResponse:
+    """Stream the rows selected by ``stmt`` as a CSV attachment.
+
+    ``stmt`` is a ``select(Model)`` from one of the ``_filter_*`` helpers.
+    Only ``columns`` are selected, so rows come back as plain tuples
+    without building ORM instances. Rows are fetched through a
+    server-side cursor in batches of ``CSV_BATCH_SIZE`` and each batch is
+    written out before the next is fetched, so memory use does not grow
+    with the size of the export.
+    """
+    fieldnames = [col.name for col in columns]
+    temporal = [
+        i for i, col in enumerate(columns)
+        if isinstance(col.type, (Date, DateTime))
+    ]
+    stmt = stmt.with_only_columns(*columns)
+
+    async def generate():
+        # Rows are encoded to UTF-8 as they are written, and each batch
+        # is handed to the response as bytes.
+        buf = io.BytesIO()
+        writer = csv.writer(
+            io.TextIOWrapper(buf, encoding="utf-8", newline="", write_through=True)
         )
+        # The response outlives the request's dependencies, so the
+        # generator holds its own session for the duration of the stream.
+        async with SessionLocal() as db:
+            result = await db.stream(
+                stmt.execution_options(yield_per=CSV_BATCH_SIZE)
+            )
+            writer.writerow(fieldnames)
+            async for batch in result.partitions():
+                if temporal:
+                    batch = [list(row) for row in batch]
+                    for row in batch:
+                        for i in temporal:
+                            if row[i] is not None:
+                                row[i] = row[i].isoformat()
+                writer.writerows(batch)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
 
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=rows[0].keys())
-    writer.writeheader()
-    for row in rows:
-        writer.writerow(row)
-    output.seek(0)
     return StreamingResponse(
-        iter([output.getvalue()]),
+        generate(),
         media_type="text/csv",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
-def _model_to_dict(obj) -> dict:
-    """Convert a SQLAlchemy model instance to a plain dict."""
-    d = {}
-    for col in obj.__table__.columns:
-        val = getattr(obj, col.name)
-        if isinstance(val, (datetime,)):
-            val = val.isoformat()
-        elif hasattr(val, "isoformat"):
-            val = val.isoformat()
-        d[col.name] = val
-    return d
-
-
-def _parse_funding_amount(amount_str: str) -> float:
-    """Parse a funding amount string like '$100,000,000' into a float."""
-    if not amount_str:
-        return 0.0
-    cleaned = re.sub(r"[^\d.]", "", amount_str)
+MAX_PAGE_SIZE = 500
+
+
+def _page_columns(model):
+    """Columns a model's list pages are ordered and keyed by, newest first."""
+    return getattr(model, "page_columns", (model.id,))
+
+
+def _encode_cursor(item, columns) -> str:
+    """Opaque cursor pointing just past ``item`` in a keyset-paged list."""
+    values = orjson.dumps([getattr(item, col.key) for col in columns])
+    return base64.urlsafe_b64encode(values).decode("ascii")
+
+
+def _cursor_value(col, value):
+    """Check one decoded cursor value against its column's type."""
+    if isinstance(col.type, Date) and type(value) is str:
+        return date.fromisoformat(value)
+    # type() rather than isinstance() so JSON true/false are rejected too
+    if isinstance(col.type, Integer) and type(value) is int:
+        return value
+    raise ValueError
+
+
+def _decode_cursor(cursor: str, columns) -> list:
     try:
-        return float(cleaned)
-    except (ValueError, TypeError):
-        return 0.0
+        values = orjson.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [_cursor_value(col, value) for col, value in zip(columns, values)]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _paginate(q, model, limit: Optional[int], cursor: Optional[str]):
+    """Apply keyset pagination to a list query.
+
+    Pages run newest-first by the model's page columns (``id`` unless the
+    model sets ``page_columns``). List responses carry an opaque
+    ``X-Next-Cursor`` header while more pages follow; pass it back as
+    ``cursor`` for the next page. One row beyond ``limit`` is fetched so
+    the caller can tell whether another page exists. Without ``limit``
+    the full result is returned in its usual order; a ``cursor`` then is
+    rejected rather than silently restarting from the first row.
+    """
+    if limit is None:
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="cursor requires limit")
+        return q
+    columns = _page_columns(model)
+    if cursor is not None:
+        q = q.where(tuple_(*columns) < tuple_(*_decode_cursor(cursor, columns)))
+    return (
+        q.order_by(None)
+        .order_by(*(col.desc() for col in columns))
+        .limit(limit + 1)
+    )
+
+
+_SEARCH_TOKEN_RE = re.compile(r"\w+")
+
+
+def _search_clause(model, search: str):
+    """Match ``search`` against the model's ``search_columns``.
+
+    Each word of ``search`` is matched as a prefix, so "Way" finds
+    "Waymo": PostgreSQL via full-text search over the GIN-indexed
+    ``search_document``, SQLite via the model's FTS5 table. Input with no
+    words, or any other database, falls back to substring ILIKE.
+    A blank ``search`` (e.g. an empty form field) matches everything.
+    """
+    search = search.strip()
+    if not search:
+        return true()
+    tokens = _SEARCH_TOKEN_RE.findall(search)
+    if engine.dialect.name == "postgresql" and tokens:
+        # \w+ tokens contain no tsquery operators, so they can be joined
+        # into query syntax directly
+        query = " & ".join(f"{token}:*" for token in tokens)
+        return search_document(*model.search_columns).op("@@")(
+            func.to_tsquery(literal_column("'english'"), query)
+        )
+    if engine.dialect.name == "sqlite" and tokens:
+        # Quoting each word keeps FTS5 query syntax in the input inert
+        match = " ".join(f'"{token}"*' for token in tokens)
+        fts = fts_table_name(model)
+        return model.id.in_(
+            select(column("rowid"))
+            .select_from(table(fts))
+            .where(literal_column(fts).op("MATCH")(match))
+        )
+    # autoescape makes % and _ in the input match literally
+    return or_(
+        *(col.icontains(search, autoescape=True) for col in model.search_columns)
+    )
+
+
+def _make_serializer(schema):
+    """Build a function copying ``schema``'s fields off an object into a dict.
+
+    The field list and getter are worked out once per schema, so each row
+    costs one C-level attrgetter call rather than a loop of getattr calls.
+    """
+    fields = tuple(schema.model_fields)
+    get_fields = operator.attrgetter(*fields)
+
+    def to_dict(obj):
+        return dict(zip(fields, get_fields(obj)))
+
+    return to_dict
+
+
+# ---------------------------------------------------------------------------
+# Utility: register the standard routes for a resource
+# ---------------------------------------------------------------------------
+def register_crud(prefix: str, model, schema_in, schema_out, filter_fn, label: str):
+    """Register list, CSV export, detail and admin CRUD routes for ``model``.
+
+    ``filter_fn`` takes the resource's filter parameters and returns a
+    ``select(model)``; its signature becomes the query string of the list
+    and export endpoints. ``label`` names the resource in 404 messages.
+    Admins also get ``POST /api/admin/<prefix>/bulk`` to create many rows
+    in one request.
+    """
+    keyword = inspect.Parameter.KEYWORD_ONLY
+    filter_params = list(inspect.signature(filter_fn).parameters.values())
+    page_params = [
+        inspect.Parameter(
+            "limit", keyword, annotation=Optional[int],
+            default=Query(None, ge=1, le=MAX_PAGE_SIZE),
+        ),
+        inspect.Parameter("cursor", keyword, annotation=Optional[str], default=None),
+        inspect.Parameter("db", keyword, annotation=AsyncSession, default=Depends(get_db)),
+    ]
+    not_found = f"{label} not found"
+    export_columns = _export_columns(model)
+
+    async def export_csv(**filters):
+        return _stream_csv(
+            filter_fn(**filters), export_columns, f"{model.__tablename__}.csv"
+        )
+
+    to_dict = _make_serializer(schema_out)
+    page_columns = _page_columns(model)
+
+    async def list_body(db, limit=None, cursor=None, **filters):
+        # raiseload: any relationship a serializer touches must be loaded
+        # explicitly (e.g. selectinload) rather than lazily per row
+        q = _paginate(filter_fn(**filters), model, limit, cursor)
+        items = (await db.execute(q.options(raiseload("*")))).scalars().all()
+        next_cursor = None
+        if limit is not None and len(items) > limit:
+            items = items[:limit]
+            next_cursor = _encode_cursor(items[-1], page_columns)
+        # Rows come straight from the database, so skip revalidating them
+        # against the response model and just copy its fields out.
+        body = orjson.dumps([to_dict(item) for item in items])
+        return body, next_cursor
+
+    async def list_items(**kwargs):
+        body, next_cursor = await list_body(**kwargs)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        return Response(body, media_type="application/json", headers=headers)
+
+    async def fetch(db: AsyncSession, id: int):
+        # Session.get checks the identity map before issuing a PK lookup
+        item = await db.get(model, id, options=[raiseload("*")])
+        if not item:
+            raise HTTPException(status_code=404, detail=not_found)
+        return item
+
+    async def get_item(id: int, db: AsyncSession = Depends(get_db)):
+        return await fetch(db, id)
+
+    async def create_item(
+        data: schema_in,
+        db: AsyncSession = Depends(get_db),
+        _admin=Depends(verify_admin),
+    ):
+        item = model(**data.dict())
+        db.add(item)
+        # eager_defaults returns the server-generated columns from the
+        # INSERT itself, so no refresh SELECT is needed afterwards
+        await db.commit()
+        invalidate_cache()
+        return item
+
+    async def bulk_create_items(
+        data: list[schema_in],
+        db: AsyncSession = Depends(get_db),
+        _admin=Depends(verify_admin),
+    ):
+        # One flush batches the INSERTs and one commit covers them all,
+        # instead of a commit and refresh per row
+        items = [model(**d.dict()) for d in data]
+        db.add_all(items)
+        await db.commit()
+        invalidate_cache()
+        return {"ids": [item.id for item in items]}
+
+    async def update_item(
+        id: int,
+        data: schema_in,
+        db: AsyncSession = Depends(get_db),
+        _admin=Depends(verify_admin),
+    ):
+        item = await fetch(db, id)
+        for key, value in data.dict().items():
+            setattr(item, key, value)
+        # The UPDATE returns updated_at (eager_defaults), so no refresh
+        await db.commit()
+        invalidate_cache()
+        return item
+
+    async def delete_item(
+        id: int,
+        db: AsyncSession = Depends(get_db),
+        _admin=Depends(verify_admin),
+    ):
+        # A single DELETE; its row count tells whether the item existed
+        result = await db.execute(delete(model).where(model.id == id))
+        if not result.rowcount:
+            raise HTTPException(status_code=404, detail=not_found)
+        await db.commit()
+        invalidate_cache()
+        return {"detail": "Deleted"}
+
+    export_csv.__signature__ = inspect.Signature(filter_params)
+    list_items.__signature__ = inspect.Signature(filter_params + page_params)
+    # The result cache keys on the function name, so give each resource's
+    # list body its own before wrapping it. The encoded body is cached
+    # rather than a Response, since middleware edits response headers.
+    list_body.__name__ = list_body.__qualname__ = f"list_{prefix}"
+    list_body = cached(list_body)
+
+    app.add_api_route(
+        f"/api/{prefix}/export/csv", export_csv, methods=["GET"],
+        name=f"export_{prefix}_csv",
+    )
+    app.add_api_route(
+        f"/api/{prefix}", list_items, methods=["GET"],
+        response_model=list[schema_out], name=f"list_{prefix}",
+    )
+    app.add_api_route(
+        f"/api/{prefix}/{{id}}", get_item, methods=["GET"],
+        response_model=schema_out, name=f"get_{prefix}",
+    )
+    app.add_api_route(
+        f"/api/admin/{prefix}", create_item, methods=["POST"],
+        response_model=schema_out, name=f"create_{prefix}",
+    )
+    app.add_api_route(
+        f"/api/admin/{prefix}/bulk", bulk_create_items, methods=["POST"],
+        name=f"bulk_create_{prefix}",
+    )
+    app.add_api_route(
+        f"/api/admin/{prefix}/{{id}}", update_item, methods=["PUT"],
+        response_model=schema_out, name=f"update_{prefix}",
+    )
+    app.add_api_route(
+        f"/api/admin/{prefix}/{{id}}", delete_item, methods=["DELETE"],
+        name=f"delete_{prefix}",
+    )
 
 
 # ===================================================================
 #  DASHBOARD
 # ===================================================================
-@app.get("/api/dashboard", response_model=DashboardSummary)
-def get_dashboard(db: Session = Depends(get_db)):
-    total_policies = db.query(Policy).count()
-    total_deployments = db.query(Deployment).count()
-    total_funding_programs = db.query(FundingProgram).count()
-    total_safety_incidents = db.query(SafetyIncident).count()
-    total_resources = db.query(Resource).count()
-    total_curbside_regulations = db.query(CurbsideRegulation).count()
-    total_news_articles = db.query(NewsArticle).count()
-
-    states_with_legislation = (
-        db.query(Policy.state_code).distinct().count()
+_pg_class = table("pg_class", column("oid"), column("reltuples"))
+# Below this many rows an exact count is cheap, and reltuples would lag
+# behind admin edits until the next ANALYZE.
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+
+def _exact_count(source):
+    return select(func.count()).select_from(source).scalar_subquery()
+
+
+def _table_count(model):
+    """Row count of ``model``'s table for the dashboard totals.
+
+    On PostgreSQL, tables the planner estimates at more than
+    ``ESTIMATED_COUNT_THRESHOLD`` rows report the ``pg_class.reltuples``
+    estimate instead of being scanned; smaller or never-analyzed tables
+    are counted exactly. Other databases always count exactly.
+    """
+    if engine.dialect.name != "postgresql":
+        return _exact_count(model)
+    # to_regclass resolves the name through search_path, so a same-named
+    # table in another schema can't match as well
+    estimate = (
+        select(cast(_pg_class.c.reltuples, BigInteger))
+        .where(_pg_class.c.oid == func.to_regclass(model.__tablename__))
+        .scalar_subquery()
     )
-
-    # Calculate total funding amount from all funding programs
-    funding_programs = db.query(FundingProgram.total_funding).all()
-    total_funding_amount = sum(
-        _parse_funding_amount(fp.total_funding)
-        for fp in funding_programs
-        if fp.total_funding
+    return case(
+        (estimate > ESTIMATED_COUNT_THRESHOLD, estimate),
+        else_=_exact_count(model),
     )
 
+
+@app.get("/api/dashboard", response_model=DashboardSummary)
+async def get_dashboard(request: Request, db: AsyncSession = Depends(get_db)):
+    # The serialized payload and its ETag are cached together, so a hit
+    # does no database or serialization work, and a client holding the
+    # current version gets an empty 304.
+    body, etag = await _dashboard_payload(db=db)
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match == "*" or etag in (
+        tag.strip() for tag in if_none_match.split(",")
+    ):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+@cached
+async def _dashboard_payload(db: AsyncSession):
+    # All totals come back as one row from a single statement
+    totals = (
+        await db.execute(
+            select(
+                _table_count(Policy).label("total_policies"),
+                _table_count(Deployment).label("total_deployments"),
+                _table_count(FundingProgram).label("total_funding_programs"),
+                _table_count(SafetyIncident).label("total_safety_incidents"),
+                _table_count(Resource).label("total_resources"),
+                _table_count(CurbsideRegulation).label("total_curbside_regulations"),
+                _table_count(NewsArticle).label("total_news_articles"),
+                select(func.count(Policy.state_code.distinct()))
+                .scalar_subquery()
+                .label("states_with_legislation"),
+                select(func.coalesce(func.sum(FundingProgram.total_funding_amount), 0.0))
+                .scalar_subquery()
+                .label("total_funding_amount"),
+            )
+        )
+    ).one()
+
     recent_policies = (
-        db.query(Policy).order_by(Policy.id.desc()).limit(5).all()
-    )
+        await db.execute(
+            select(Policy)
+            .order_by(Policy.id.desc())
+            .limit(5)
+            .options(raiseload("*"))
+        )
+    ).scalars().all()
     recent_news = (
-        db.query(NewsArticle)
-        .order_by(NewsArticle.publication_date.desc())
-        .limit(6)
-        .all()
-    )
+        await db.execute(
+            select(NewsArticle)
+            .order_by(NewsArticle.publication_date.desc())
+            .limit(6)
+            .options(raiseload("*"))
+        )
+    ).scalars().all()
 
-    return DashboardSummary(
-        total_policies=total_policies,
-        total_deployments=total_deployments,
-        total_funding_programs=total_funding_programs,
-        total_safety_incidents=total_safety_incidents,
-        total_resources=total_resources,
-        total_curbside_regulations=total_curbside_regulations,
-        total_news_articles=total_news_articles,
-        states_with_legislation=states_with_legislation,
-        total_funding_amount=total_funding_amount,
+    summary = DashboardSummary(
+        **totals._mapping,
         recent_policies=recent_policies,
         recent_news=recent_news,
     )
+    body = orjson.dumps(summary.model_dump())
+    # Weak, since the gzip middleware may re-encode the body
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    return body, etag
 
 
 # ===================================================================
 #  POLICIES
 # ===================================================================
 def _filter_policies(
-    db: Session,
     status: Optional[str] = None,
     jurisdiction: Optional[str] = None,
     state_code: Optional[str] = None,
     search: Optional[str] = None,
 ):
-    q = db.query(Policy)
+    q = select(Policy)
     if status:
-        q = q.filter(func.lower(Policy.status) == status.lower())
+        q = q.where(func.lower(Policy.status) == status.lower())
     if jurisdiction:
-        q = q.filter(Policy.jurisdiction == jurisdiction)
+        q = q.where(Policy.jurisdiction == jurisdiction)
     if state_code:
-        q = q.filter(Policy.state_code == state_code)
+        q = q.where(Policy.state_code == state_code)
     if search:
-        q = q.filter(
-            or_(
-                Policy.title.ilike(f"%{search}%"),
-                Policy.jurisdiction.ilike(f"%{search}%"),
-                Policy.summary.ilike(f"%{search}%"),
-            )
-        )
+        q = q.where(_search_clause(Policy, search))
     return q
 
 
-@app.get("/api/policies/export/csv")
-def export_policies_csv(
-    status: Optional[str] = None,
-    jurisdiction: Optional[str] = None,
-    state_code: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    items = _filter_policies(db, status, jurisdiction, state_code, search).all()
-    rows = [_model_to_dict(i) for i in items]
-    return _rows_to_csv(rows, "policies.csv")
+# Policy statuses that color a state on the map
+_ACTIVE_STATUSES = frozenset({"enacted", "active", "signed"})
+_PENDING_STATUSES = frozenset({"pending", "proposed", "introduced"})
 
 
 @app.get("/api/policies/map/states")
-def policies_map_states(db: Session = Depends(get_db)):
-    results = (
-        db.query(
+@cached
+async def policies_map_states(db: AsyncSession = Depends(get_db)):
+    # Rank each state's statuses by frequency in one pass; rank 1 is the
+    # state's most common status and carries the state's total count.
+    status_count = func.count(Policy.id)
+    ranked = (
+        select(
             Policy.state_code,
-            func.count(Policy.id).label("count"),
+            Policy.status,
+            func.sum(status_count)
+            .over(partition_by=Policy.state_code)
+            .label("count"),
+            func.row_number()
+            .over(partition_by=Policy.state_code, order_by=status_count.desc())
+            .label("rank"),
         )
-        .group_by(Policy.state_code)
-        .all()
+        .group_by(Policy.state_code, Policy.status)
+        .subquery()
     )
-    out = []
-    for state_code, count in results:
-        # Grab the most common status for this state
-        top_status_row = (
-            db.query(Policy.status)
-            .filter(Policy.state_code == state_code)
-            .group_by(Policy.status)
-            .order_by(func.count(Policy.id).desc())
-            .first()
+    results = (
+        await db.execute(
+            select(ranked.c.state_code, ranked.c.count, ranked.c.status)
+            .where(ranked.c.rank == 1)
+            .order_by(ranked.c.state_code)
         )
-        top_status = top_status_row[0] if top_status_row else None
-
+    ).all()
+    out = []
+    for state_code, count, top_status in results:
         # Determine policy_status for map coloring
-        if top_status and top_status.lower() in ("enacted", "active", "signed"):
+        status_key = top_status.lower() if top_status else ""
+        if status_key in _ACTIVE_STATUSES:
             policy_status = "active"
-        elif top_status and top_status.lower() in ("pending", "proposed", "introduced"):
+        elif status_key in _PENDING_STATUSES:
             policy_status = "under_consideration"
         else:
             policy_status = "none"
@@ -258,74 +662,13 @@ def policies_map_states(db: Session = Depends(get_db)):
     return out
 
 
-@app.get("/api/policies", response_model=list[PolicyOut])
-def list_policies(
-    status: Optional[str] = None,
-    jurisdiction: Optional[str] = None,
-    state_code: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    return _filter_policies(db, status, jurisdiction, state_code, search).all()
-
-
-@app.get("/api/policies/{id}", response_model=PolicyOut)
-def get_policy(id: int, db: Session = Depends(get_db)):
-    item = db.query(Policy).filter(Policy.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Policy not found")
-    return item
-
-
-@app.post("/api/admin/policies", response_model=PolicyOut)
-def create_policy(
-    data: PolicyCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = Policy(**data.dict())
-    db.add(item)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.put("/api/admin/policies/{id}", response_model=PolicyOut)
-def update_policy(
-    id: int,
-    data: PolicyCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(Policy).filter(Policy.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Policy not found")
-    for key, value in data.dict().items():
-        setattr(item, key, value)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.delete("/api/admin/policies/{id}")
-def delete_policy(
-    id: int,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(Policy).filter(Policy.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Policy not found")
-    db.delete(item)
-    db.commit()
-    return {"detail": "Deleted"}
+register_crud("policies", Policy, PolicyCreate, PolicyOut, _filter_policies, "Policy")
 
 
 # ===================================================================
 #  DEPLOYMENTS
 # ===================================================================
 def _filter_deployments(
-    db: Session,
     status: Optional[str] = None,
     operator: Optional[str] = None,
     city: Optional[str] = None,
@@ -333,730 +676,270 @@ def _filter_deployments(
     search: Optional[str] = None,
     vehicle_type: Optional[str] = None,
 ):
-    q = db.query(Deployment)
+    q = select(Deployment)
     if status:
-        q = q.filter(func.lower(Deployment.status) == status.lower())
+        q = q.where(func.lower(Deployment.status) == status.lower())
     if operator:
-        q = q.filter(Deployment.operator == operator)
+        q = q.where(Deployment.operator == operator)
     if city:
-        q = q.filter(Deployment.city == city)
+        q = q.where(Deployment.city == city)
     if state:
-        q = q.filter(Deployment.state == state)
+        q = q.where(Deployment.state == state)
     if vehicle_type:
-        q = q.filter(func.lower(Deployment.vehicle_type) == vehicle_type.lower())
+        q = q.where(func.lower(Deployment.vehicle_type) == vehicle_type.lower())
     if search:
-        q = q.filter(
-            or_(
-                Deployment.operator.ilike(f"%{search}%"),
-                Deployment.city.ilike(f"%{search}%"),
-                Deployment.state.ilike(f"%{search}%"),
-                Deployment.description.ilike(f"%{search}%"),
-            )
-        )
+        q = q.where(_search_clause(Deployment, search))
     return q
 
 
-@app.get("/api/deployments/export/csv")
-def export_deployments_csv(
-    status: Optional[str] = None,
-    operator: Optional[str] = None,
-    city: Optional[str] = None,
-    state: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    items = _filter_deployments(db, status, operator, city, state, search).all()
-    rows = [_model_to_dict(i) for i in items]
-    return _rows_to_csv(rows, "deployments.csv")
-
-
 @app.get("/api/deployments/map/locations")
-def deployments_map_locations(db: Session = Depends(get_db)):
-    items = db.query(Deployment).all()
-    return [
-        {
-            "id": d.id,
-            "operator": d.operator,
-            "city": d.city,
-            "state": d.state,
-            "latitude": d.latitude,
-            "longitude": d.longitude,
-            "status": d.status,
-            "vehicle_type": d.vehicle_type,
-        }
-        for d in items
-    ]
-
-
-@app.get("/api/deployments", response_model=list[DeploymentOut])
-def list_deployments(
-    status: Optional[str] = None,
-    operator: Optional[str] = None,
-    city: Optional[str] = None,
-    state: Optional[str] = None,
-    search: Optional[str] = None,
-    vehicle_type: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    return _filter_deployments(db, status, operator, city, state, search, vehicle_type).all()
-
-
-@app.get("/api/deployments/{id}", response_model=DeploymentOut)
-def get_deployment(id: int, db: Session = Depends(get_db)):
-    item = db.query(Deployment).filter(Deployment.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Deployment not found")
-    return item
+@cached
+async def deployments_map_locations(db: AsyncSession = Depends(get_db)):
+    # Select only the fields the map needs rather than whole ORM rows
+    rows = await db.execute(
+        select(
+            Deployment.id,
+            Deployment.operator,
+            Deployment.city,
+            Deployment.state,
+            Deployment.latitude,
+            Deployment.longitude,
+            Deployment.status,
+            Deployment.vehicle_type,
+        )
+    )
+    return [dict(row) for row in rows.mappings()]
 
 
-@app.post("/api/admin/deployments", response_model=DeploymentOut)
-def create_deployment(
-    data: DeploymentCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = Deployment(**data.dict())
-    db.add(item)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.put("/api/admin/deployments/{id}", response_model=DeploymentOut)
-def update_deployment(
-    id: int,
-    data: DeploymentCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(Deployment).filter(Deployment.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Deployment not found")
-    for key, value in data.dict().items():
-        setattr(item, key, value)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.delete("/api/admin/deployments/{id}")
-def delete_deployment(
-    id: int,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(Deployment).filter(Deployment.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Deployment not found")
-    db.delete(item)
-    db.commit()
-    return {"detail": "Deleted"}
+register_crud("deployments", Deployment, DeploymentCreate, DeploymentOut, _filter_deployments, "Deployment")
 
 
 # ===================================================================
 #  FUNDING PROGRAMS
 # ===================================================================
 def _filter_funding(
-    db: Session,
     status: Optional[str] = None,
     agency: Optional[str] = None,
     funding_type: Optional[str] = None,
     search: Optional[str] = None,
 ):
-    q = db.query(FundingProgram)
+    q = select(FundingProgram)
     if status:
-        q = q.filter(func.lower(FundingProgram.status) == status.lower())
+        q = q.where(func.lower(FundingProgram.status) == status.lower())
     if agency:
-        q = q.filter(FundingProgram.agency.ilike(f"%{agency}%"))
+        q = q.where(FundingProgram.agency.icontains(agency, autoescape=True))
     if funding_type:
-        q = q.filter(func.lower(FundingProgram.funding_type) == funding_type.lower())
+        q = q.where(func.lower(FundingProgram.funding_type) == funding_type.lower())
     if search:
-        q = q.filter(
-            or_(
-                FundingProgram.program_name.ilike(f"%{search}%"),
-                FundingProgram.agency.ilike(f"%{search}%"),
-                FundingProgram.description.ilike(f"%{search}%"),
-            )
-        )
+        q = q.where(_search_clause(FundingProgram, search))
     return q
 
 
-@app.get("/api/funding/export/csv")
-def export_funding_csv(
-    status: Optional[str] = None,
-    agency: Optional[str] = None,
-    funding_type: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    items = _filter_funding(db, status, agency, funding_type, search).all()
-    rows = [_model_to_dict(i) for i in items]
-    return _rows_to_csv(rows, "funding_programs.csv")
-
-
-@app.get("/api/funding", response_model=list[FundingProgramOut])
-def list_funding(
-    status: Optional[str] = None,
-    agency: Optional[str] = None,
-    funding_type: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    return _filter_funding(db, status, agency, funding_type, search).all()
-
-
-@app.get("/api/funding/{id}", response_model=FundingProgramOut)
-def get_funding(id: int, db: Session = Depends(get_db)):
-    item = db.query(FundingProgram).filter(FundingProgram.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Funding program not found")
-    return item
-
-
-@app.post("/api/admin/funding", response_model=FundingProgramOut)
-def create_funding(
-    data: FundingProgramCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = FundingProgram(**data.dict())
-    db.add(item)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.put("/api/admin/funding/{id}", response_model=FundingProgramOut)
-def update_funding(
-    id: int,
-    data: FundingProgramCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(FundingProgram).filter(FundingProgram.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Funding program not found")
-    for key, value in data.dict().items():
-        setattr(item, key, value)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.delete("/api/admin/funding/{id}")
-def delete_funding(
-    id: int,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(FundingProgram).filter(FundingProgram.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Funding program not found")
-    db.delete(item)
-    db.commit()
-    return {"detail": "Deleted"}
+register_crud("funding", FundingProgram, FundingProgramCreate, FundingProgramOut, _filter_funding, "Funding program")
 
 
 # ===================================================================
 #  SAFETY INCIDENTS
 # ===================================================================
 def _filter_safety(
-    db: Session,
     severity: Optional[str] = None,
     manufacturer: Optional[str] = None,
     incident_type: Optional[str] = None,
     state: Optional[str] = None,
     search: Optional[str] = None,
 ):
-    q = db.query(SafetyIncident)
+    q = select(SafetyIncident)
     if severity:
-        q = q.filter(func.lower(SafetyIncident.severity) == severity.lower())
+        q = q.where(func.lower(SafetyIncident.severity) == severity.lower())
     if manufacturer:
-        q = q.filter(SafetyIncident.manufacturer == manufacturer)
+        q = q.where(SafetyIncident.manufacturer == manufacturer)
     if incident_type:
-        q = q.filter(func.lower(SafetyIncident.incident_type) == incident_type.lower())
+        q = q.where(func.lower(SafetyIncident.incident_type) == incident_type.lower())
     if state:
-        q = q.filter(SafetyIncident.state == state)
+        q = q.where(SafetyIncident.state == state)
     if search:
-        q = q.filter(
-            or_(
-                SafetyIncident.report_id.ilike(f"%{search}%"),
-                SafetyIncident.manufacturer.ilike(f"%{search}%"),
-                SafetyIncident.description.ilike(f"%{search}%"),
-                SafetyIncident.city.ilike(f"%{search}%"),
-            )
-        )
+        q = q.where(_search_clause(SafetyIncident, search))
     return q
 
 
-@app.get("/api/safety/export/csv")
-def export_safety_csv(
-    severity: Optional[str] = None,
-    manufacturer: Optional[str] = None,
-    incident_type: Optional[str] = None,
-    state: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    items = _filter_safety(db, severity, manufacturer, incident_type, state, search).all()
-    rows = [_model_to_dict(i) for i in items]
-    return _rows_to_csv(rows, "safety_incidents.csv")
+# Groupings returned by /api/safety/stats: (response key, item field, expression)
+_SAFETY_STAT_GROUPS = (
+    ("by_manufacturer", "manufacturer", SafetyIncident.manufacturer),
+    ("by_type", "incident_type", SafetyIncident.incident_type),
+    ("by_year", "year", extract("year", SafetyIncident.date)),
+    ("by_severity", "severity", SafetyIncident.severity),
+)
 
 
-@app.get("/api/safety/stats/by-manufacturer")
-def safety_stats_by_manufacturer(db: Session = Depends(get_db)):
-    results = (
-        db.query(
-            SafetyIncident.manufacturer,
+@cached
+async def _safety_stat_groups(db: AsyncSession, keys: tuple):
+    """Counts for the ``_SAFETY_STAT_GROUPS`` named in ``keys``.
+
+    The groupings come back from one UNION ALL statement. Values are cast
+    to text so the branches share a column type.
+    """
+    groups = [group for group in _SAFETY_STAT_GROUPS if group[0] in keys]
+    selects = [
+        select(
+            literal(key).label("grouping"),
+            cast(expr, String).label("value"),
             func.count(SafetyIncident.id).label("count"),
+        ).group_by(expr)
+        for key, _, expr in groups
+    ]
+    stmt = union_all(*selects) if len(selects) > 1 else selects[0]
+    results = (await db.execute(stmt)).all()
+    fields = {key: field for key, field, _ in groups}
+    stats = {key: [] for key in fields}
+    for grouping, value, count in results:
+        stats[grouping].append({fields[grouping]: value, "count": count})
+    if "by_year" in stats:
+        stats["by_year"] = sorted(
+            (
+                {"year": int(r["year"]) if r["year"] else None, "count": r["count"]}
+                for r in stats["by_year"]
+            ),
+            key=lambda r: (r["year"] is not None, r["year"]),
         )
-        .group_by(SafetyIncident.manufacturer)
-        .all()
-    )
-    return [{"manufacturer": r[0], "count": r[1]} for r in results]
+    return stats
 
 
-@app.get("/api/safety/stats/by-type")
-def safety_stats_by_type(db: Session = Depends(get_db)):
-    results = (
-        db.query(
-            SafetyIncident.incident_type,
-            func.count(SafetyIncident.id).label("count"),
-        )
-        .group_by(SafetyIncident.incident_type)
-        .all()
-    )
-    return [{"incident_type": r[0], "count": r[1]} for r in results]
+@app.get("/api/safety/stats")
+async def safety_stats(db: AsyncSession = Depends(get_db)):
+    keys = tuple(key for key, _, _ in _SAFETY_STAT_GROUPS)
+    return await _safety_stat_groups(db=db, keys=keys)
 
 
-@app.get("/api/safety/stats/by-year")
-def safety_stats_by_year(db: Session = Depends(get_db)):
-    results = (
-        db.query(
-            extract("year", SafetyIncident.date).label("year"),
-            func.count(SafetyIncident.id).label("count"),
-        )
-        .group_by("year")
-        .order_by("year")
-        .all()
-    )
-    return [{"year": int(r[0]) if r[0] else None, "count": r[1]} for r in results]
+async def _safety_stat_group(db: AsyncSession, key: str):
+    return (await _safety_stat_groups(db=db, keys=(key,)))[key]
 
 
-@app.get("/api/safety/stats/by-severity")
-def safety_stats_by_severity(db: Session = Depends(get_db)):
-    results = (
-        db.query(
-            SafetyIncident.severity,
-            func.count(SafetyIncident.id).label("count"),
-        )
-        .group_by(SafetyIncident.severity)
-        .all()
-    )
-    return [{"severity": r[0], "count": r[1]} for r in results]
+@app.get("/api/safety/stats/by-manufacturer")
+async def safety_stats_by_manufacturer(db: AsyncSession = Depends(get_db)):
+    return await _safety_stat_group(db, "by_manufacturer")
 
 
-@app.get("/api/safety/map/locations")
-def safety_map_locations(db: Session = Depends(get_db)):
-    items = db.query(SafetyIncident).all()
-    return [
-        {
-            "id": i.id,
-            "operator": i.manufacturer,
-            "city": i.city,
-            "state": i.state,
-            "latitude": i.latitude,
-            "longitude": i.longitude,
-            "incident_type": i.incident_type,
-            "date": i.date.isoformat() if i.date else None,
-        }
-        for i in items
-        if i.latitude and i.longitude
-    ]
+@app.get("/api/safety/stats/by-type")
+async def safety_stats_by_type(db: AsyncSession = Depends(get_db)):
+    return await _safety_stat_group(db, "by_type")
 
 
-@app.get("/api/safety", response_model=list[SafetyIncidentOut])
-def list_safety(
-    severity: Optional[str] = None,
-    manufacturer: Optional[str] = None,
-    incident_type: Optional[str] = None,
-    state: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    return _filter_safety(db, severity, manufacturer, incident_type, state, search).all()
+@app.get("/api/safety/stats/by-year")
+async def safety_stats_by_year(db: AsyncSession = Depends(get_db)):
+    return await _safety_stat_group(db, "by_year")
 
 
-@app.get("/api/safety/{id}", response_model=SafetyIncidentOut)
-def get_safety(id: int, db: Session = Depends(get_db)):
-    item = db.query(SafetyIncident).filter(SafetyIncident.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Safety incident not found")
-    return item
+@app.get("/api/safety/stats/by-severity")
+async def safety_stats_by_severity(db: AsyncSession = Depends(get_db)):
+    return await _safety_stat_group(db, "by_severity")
 
 
-@app.post("/api/admin/safety", response_model=SafetyIncidentOut)
-def create_safety(
-    data: SafetyIncidentCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = SafetyIncident(**data.dict())
-    db.add(item)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.put("/api/admin/safety/{id}", response_model=SafetyIncidentOut)
-def update_safety(
-    id: int,
-    data: SafetyIncidentCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(SafetyIncident).filter(SafetyIncident.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Safety incident not found")
-    for key, value in data.dict().items():
-        setattr(item, key, value)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.delete("/api/admin/safety/{id}")
-def delete_safety(
-    id: int,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(SafetyIncident).filter(SafetyIncident.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Safety incident not found")
-    db.delete(item)
-    db.commit()
-    return {"detail": "Deleted"}
+@app.get("/api/safety/map/locations")
+@cached
+async def safety_map_locations(db: AsyncSession = Depends(get_db)):
+    rows = await db.execute(
+        select(
+            SafetyIncident.id,
+            SafetyIncident.manufacturer.label("operator"),
+            SafetyIncident.city,
+            SafetyIncident.state,
+            SafetyIncident.latitude,
+            SafetyIncident.longitude,
+            SafetyIncident.incident_type,
+            SafetyIncident.date,
+        )
+        .where(SafetyIncident.latitude.isnot(None), SafetyIncident.longitude.isnot(None))
+        .order_by(SafetyIncident.id)
+    )
+    return [dict(row) for row in rows.mappings()]
+
+
+register_crud("safety", SafetyIncident, SafetyIncidentCreate, SafetyIncidentOut, _filter_safety, "Safety incident")
 
 
 # ===================================================================
 #  RESOURCES
 # ===================================================================
 def _filter_resources(
-    db: Session,
     resource_type: Optional[str] = None,
     category: Optional[str] = None,
     search: Optional[str] = None,
 ):
-    q = db.query(Resource)
+    q = select(Resource)
     if resource_type:
-        q = q.filter(Resource.resource_type == resource_type)
+        q = q.where(Resource.resource_type == resource_type)
     if category:
-        q = q.filter(Resource.category == category)
+        q = q.where(Resource.topic_area == category)
     if search:
-        q = q.filter(
-            or_(
-                Resource.title.ilike(f"%{search}%"),
-                Resource.description.ilike(f"%{search}%"),
-                Resource.source.ilike(f"%{search}%"),
-            )
-        )
+        q = q.where(_search_clause(Resource, search))
     return q
 
 
-@app.get("/api/resources/export/csv")
-def export_resources_csv(
-    resource_type: Optional[str] = None,
-    category: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    items = _filter_resources(db, resource_type, category, search).all()
-    rows = [_model_to_dict(i) for i in items]
-    return _rows_to_csv(rows, "resources.csv")
-
-
-@app.get("/api/resources", response_model=list[ResourceOut])
-def list_resources(
-    resource_type: Optional[str] = None,
-    category: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    return _filter_resources(db, resource_type, category, search).all()
-
-
-@app.get("/api/resources/{id}", response_model=ResourceOut)
-def get_resource(id: int, db: Session = Depends(get_db)):
-    item = db.query(Resource).filter(Resource.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Resource not found")
-    return item
-
-
-@app.post("/api/admin/resources", response_model=ResourceOut)
-def create_resource(
-    data: ResourceCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = Resource(**data.dict())
-    db.add(item)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.put("/api/admin/resources/{id}", response_model=ResourceOut)
-def update_resource(
-    id: int,
-    data: ResourceCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(Resource).filter(Resource.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Resource not found")
-    for key, value in data.dict().items():
-        setattr(item, key, value)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.delete("/api/admin/resources/{id}")
-def delete_resource(
-    id: int,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(Resource).filter(Resource.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Resource not found")
-    db.delete(item)
-    db.commit()
-    return {"detail": "Deleted"}
+register_crud("resources", Resource, ResourceCreate, ResourceOut, _filter_resources, "Resource")
 
 
 # ===================================================================
 #  CURBSIDE REGULATIONS
 # ===================================================================
 def _filter_curbside(
-    db: Session,
     status: Optional[str] = None,
     city: Optional[str] = None,
     state: Optional[str] = None,
     zone_type: Optional[str] = None,
     search: Optional[str] = None,
 ):
-    q = db.query(CurbsideRegulation)
+    q = select(CurbsideRegulation)
     if status:
-        q = q.filter(CurbsideRegulation.status == status)
+        q = q.where(CurbsideRegulation.status == status)
     if city:
-        q = q.filter(CurbsideRegulation.city == city)
+        q = q.where(CurbsideRegulation.city == city)
     if state:
-        q = q.filter(CurbsideRegulation.state == state)
+        q = q.where(CurbsideRegulation.state == state)
     if zone_type:
-        q = q.filter(CurbsideRegulation.zone_type == zone_type)
+        q = q.where(CurbsideRegulation.regulation_type == zone_type)
     if search:
-        q = q.filter(
-            or_(
-                CurbsideRegulation.title.ilike(f"%{search}%"),
-                CurbsideRegulation.city.ilike(f"%{search}%"),
-                CurbsideRegulation.state.ilike(f"%{search}%"),
-                CurbsideRegulation.description.ilike(f"%{search}%"),
-            )
-        )
+        q = q.where(_search_clause(CurbsideRegulation, search))
     return q
 
 
-@app.get("/api/curbside/export/csv")
-def export_curbside_csv(
-    status: Optional[str] = None,
-    city: Optional[str] = None,
-    state: Optional[str] = None,
-    zone_type: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    items = _filter_curbside(db, status, city, state, zone_type, search).all()
-    rows = [_model_to_dict(i) for i in items]
-    return _rows_to_csv(rows, "curbside_regulations.csv")
-
-
 @app.get("/api/curbside/map/locations")
-def curbside_map_locations(db: Session = Depends(get_db)):
-    items = db.query(CurbsideRegulation).all()
-    return [
-        {
-            "id": r.id,
-            "city": r.city,
-            "state": r.state,
-            "latitude": r.latitude,
-            "longitude": r.longitude,
-            "regulation_type": r.regulation_type,
-            "status": r.status,
-        }
-        for r in items
-        if r.latitude and r.longitude
-    ]
-
-
-@app.get("/api/curbside", response_model=list[CurbsideRegulationOut])
-def list_curbside(
-    status: Optional[str] = None,
-    city: Optional[str] = None,
-    state: Optional[str] = None,
-    zone_type: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    return _filter_curbside(db, status, city, state, zone_type, search).all()
-
-
-@app.get("/api/curbside/{id}", response_model=CurbsideRegulationOut)
-def get_curbside(id: int, db: Session = Depends(get_db)):
-    item = db.query(CurbsideRegulation).filter(CurbsideRegulation.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Curbside regulation not found")
-    return item
+@cached
+async def curbside_map_locations(db: AsyncSession = Depends(get_db)):
+    rows = await db.execute(
+        select(
+            CurbsideRegulation.id,
+            CurbsideRegulation.city,
+            CurbsideRegulation.state,
+            CurbsideRegulation.latitude,
+            CurbsideRegulation.longitude,
+            CurbsideRegulation.regulation_type,
+            CurbsideRegulation.status,
+        )
+        .where(CurbsideRegulation.latitude.isnot(None), CurbsideRegulation.longitude.isnot(None))
+        .order_by(CurbsideRegulation.id)
+    )
+    return [dict(row) for row in rows.mappings()]
 
 
-@app.post("/api/admin/curbside", response_model=CurbsideRegulationOut)
-def create_curbside(
-    data: CurbsideRegulationCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = CurbsideRegulation(**data.dict())
-    db.add(item)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.put("/api/admin/curbside/{id}", response_model=CurbsideRegulationOut)
-def update_curbside(
-    id: int,
-    data: CurbsideRegulationCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(CurbsideRegulation).filter(CurbsideRegulation.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Curbside regulation not found")
-    for key, value in data.dict().items():
-        setattr(item, key, value)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.delete("/api/admin/curbside/{id}")
-def delete_curbside(
-    id: int,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(CurbsideRegulation).filter(CurbsideRegulation.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Curbside regulation not found")
-    db.delete(item)
-    db.commit()
-    return {"detail": "Deleted"}
+register_crud("curbside", CurbsideRegulation, CurbsideRegulationCreate, CurbsideRegulationOut, _filter_curbside, "Curbside regulation")
 
 
 # ===================================================================
 #  NEWS ARTICLES
 # ===================================================================
 def _filter_news(
-    db: Session,
     category: Optional[str] = None,
     search: Optional[str] = None,
 ):
-    q = db.query(NewsArticle).order_by(NewsArticle.publication_date.desc())
+    q = select(NewsArticle).order_by(NewsArticle.publication_date.desc())
     if category:
-        q = q.filter(NewsArticle.category == category)
+        q = q.where(NewsArticle.category == category)
     if search:
-        q = q.filter(
-            or_(
-                NewsArticle.headline.ilike(f"%{search}%"),
-                NewsArticle.summary.ilike(f"%{search}%"),
-            )
-        )
+        q = q.where(_search_clause(NewsArticle, search))
     return q
 
 
-@app.get("/api/news/export/csv")
-def export_news_csv(
-    category: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    items = _filter_news(db, category, search).all()
-    rows = [_model_to_dict(i) for i in items]
-    return _rows_to_csv(rows, "news_articles.csv")
-
-
-@app.get("/api/news", response_model=list[NewsArticleOut])
-def list_news(
-    category: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    return _filter_news(db, category, search).all()
-
-
-@app.get("/api/news/{id}", response_model=NewsArticleOut)
-def get_news(id: int, db: Session = Depends(get_db)):
-    item = db.query(NewsArticle).filter(NewsArticle.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="News article not found")
-    return item
-
-
-@app.post("/api/admin/news", response_model=NewsArticleOut)
-def create_news(
-    data: NewsArticleCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = NewsArticle(**data.dict())
-    db.add(item)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.put("/api/admin/news/{id}", response_model=NewsArticleOut)
-def update_news(
-    id: int,
-    data: NewsArticleCreate,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(NewsArticle).filter(NewsArticle.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="News article not found")
-    for key, value in data.dict().items():
-        setattr(item, key, value)
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@app.delete("/api/admin/news/{id}")
-def delete_news(
-    id: int,
-    db: Session = Depends(get_db),
-    _admin=Depends(verify_admin),
-):
-    item = db.query(NewsArticle).filter(NewsArticle.id == id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="News article not found")
-    db.delete(item)
-    db.commit()
-    return {"detail": "Deleted"}
+register_crud("news", NewsArticle, NewsArticleCreate, NewsArticleOut, _filter_news, "News article")
 
 
 # ===================================================================
@@ -1064,15 +947,32 @@ def delete_news(
 # ===================================================================
 _static_dir = pathlib.Path(__file__).resolve().parent / "static"
 
+
+class _ImmutableStaticFiles(StaticFiles):
+    """Vite fingerprints bundle filenames, so they never change in place."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
 if _static_dir.is_dir():
-    app.mount("/assets", StaticFiles(directory=_static_dir / "assets"), name="assets")
+    app.mount("/assets", _ImmutableStaticFiles(directory=_static_dir / "assets"), name="assets")
+
+    # The build output is fixed for the life of the process (--reload
+    # restarts it), so list it once instead of stat()ing per request.
+    _static_files = frozenset(
+        p.relative_to(_static_dir).as_posix()
+        for p in _static_dir.rglob("*")
+        if p.is_file()
+    )
 
     @app.get("/{full_path:path}")
     async def serve_spa(full_path: str):
         """Serve the React SPA for any non-API route."""
-        file = _static_dir / full_path
-        if file.is_file():
-            return FileResponse(file)
+        if full_path in _static_files:
+            return FileResponse(_static_dir / full_path)
         return FileResponse(_static_dir / "index.html")
 
 
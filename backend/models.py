@@ -1,54 +1,141 @@
-from sqlalchemy import Column, Integer, String, Text, Float, Date, DateTime, Boolean
-from sqlalchemy.sql import func
+import re
+
+from sqlalchemy import (
+    Column, Integer, String, Text, Float, Date, DateTime, Boolean, Index, event,
+    bindparam, inspect, select,
+)
+from sqlalchemy.orm import validates
+from sqlalchemy.sql import and_, extract, func, literal_column
+# Must run before search_document() builds func.to_tsvector: the PostgreSQL
+# compiler rejects to_tsvector constructs created before its full-text
+# function types were registered.
+import sqlalchemy.dialects.postgresql  # noqa: F401
 from database import Base
 
 
+def search_document(*columns):
+    """English tsvector over ``columns`` for PostgreSQL full-text search.
+
+    Constants are rendered inline so the expression used in queries is
+    identical to the one in the GIN index and the planner can match them.
+    """
+    doc = func.coalesce(columns[0], literal_column("''"))
+    for col in columns[1:]:
+        doc = doc.op("||")(literal_column("' '")).op("||")(
+            func.coalesce(col, literal_column("''"))
+        )
+    return func.to_tsvector(literal_column("'english'"), doc)
+
+
+_NON_AMOUNT_RE = re.compile(r"[^\d.]")
+# Deletes every ASCII character except digits and '.'
+_NON_AMOUNT_ASCII = str.maketrans(
+    "", "", "".join(c for c in map(chr, range(128)) if c not in "0123456789.")
+)
+
+
+def _parse_funding_amount(amount_str: str) -> float:
+    """Parse a funding amount string like '$100,000,000' into a float."""
+    if not amount_str:
+        return 0.0
+    if amount_str.isascii():
+        cleaned = amount_str.translate(_NON_AMOUNT_ASCII)
+    else:
+        # \d also matches non-ASCII digits, which float() accepts
+        cleaned = _NON_AMOUNT_RE.sub("", amount_str)
+    try:
+        return float(cleaned)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def located_index(name, latitude, longitude):
+    """Partial index on rows that have coordinates, for the map endpoints."""
+    located = and_(latitude.isnot(None), longitude.isnot(None))
+    return Index(
+        name, latitude, longitude,
+        sqlite_where=located, postgresql_where=located,
+    )
+
+
+def search_index(name, *columns):
+    """GIN index on ``search_document(*columns)``, created on PostgreSQL only."""
+    return Index(
+        name, search_document(*columns), postgresql_using="gin"
+    ).ddl_if(dialect="postgresql")
+
+
 class Policy(Base):
     __tablename__ = "policies"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     jurisdiction = Column(String(100), nullable=False, index=True)
-    state_code = Column(String(2), index=True)
-    policy_type = Column(String(50), nullable=False, index=True)
+    state_code = Column(String(2))
+    policy_type = Column(String(50), nullable=False)
     title = Column(String(500), nullable=False)
     vehicle_class = Column(String(200))
     date_enacted = Column(Date)
-    status = Column(String(50), index=True)
+    status = Column(String(50))
     summary = Column(Text)
     source_url = Column(String(1000))
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    search_columns = (title, jurisdiction, summary)
+
+    __table_args__ = (
+        # Map view groups by (state_code, status)
+        Index("ix_policies_state_code_status", "state_code", "status"),
+        # Status filters compare case-insensitively
+        Index("ix_policies_status_lower", func.lower(status)),
+        search_index("ix_policies_search", *search_columns),
+    )
+
 
 class Deployment(Base):
     __tablename__ = "deployments"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     operator = Column(String(200), nullable=False, index=True)
     program_name = Column(String(500))
-    city = Column(String(200), nullable=False)
-    state = Column(String(100), nullable=False, index=True)
+    city = Column(String(200), nullable=False, index=True)
+    state = Column(String(100), nullable=False)
     state_code = Column(String(2))
     latitude = Column(Float)
     longitude = Column(Float)
     vehicle_type = Column(String(100))
     operational_domain = Column(String(200))
-    status = Column(String(50), index=True)
+    status = Column(String(50))
     start_date = Column(Date)
     description = Column(Text)
     source_url = Column(String(1000))
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    search_columns = (operator, city, state, description)
+
+    __table_args__ = (
+        # Location filters usually narrow by state, then city
+        Index("ix_deployments_state_city", "state", "city"),
+        Index("ix_deployments_status_lower", func.lower(status)),
+        Index("ix_deployments_vehicle_type_lower", func.lower(vehicle_type)),
+        search_index("ix_deployments_search", *search_columns),
+    )
+
 
 class FundingProgram(Base):
     __tablename__ = "funding_programs"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     program_name = Column(String(500), nullable=False)
-    agency = Column(String(200), nullable=False, index=True)
+    agency = Column(String(200), nullable=False)
     funding_type = Column(String(100))
     total_funding = Column(String(200))
+    # Numeric copy of total_funding so the dashboard can SUM it in SQL
+    total_funding_amount = Column(Float)
     award_range = Column(String(200))
     application_deadline = Column(Date)
     date_enacted = Column(Date)
@@ -56,18 +143,34 @@ class FundingProgram(Base):
     eligibility = Column(Text)
     description = Column(Text)
     av_relevance = Column(Text)
-    status = Column(String(50), index=True)
+    status = Column(String(50))
     source_url = Column(String(1000))
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    search_columns = (program_name, agency, description)
+    # Derived from total_funding; kept out of CSV exports
+    internal_columns = ("total_funding_amount",)
+
+    __table_args__ = (
+        Index("ix_funding_programs_status_lower", func.lower(status)),
+        Index("ix_funding_programs_funding_type_lower", func.lower(funding_type)),
+        search_index("ix_funding_programs_search", *search_columns),
+    )
+
+    @validates("total_funding")
+    def _sync_total_funding_amount(self, key, value):
+        self.total_funding_amount = _parse_funding_amount(value)
+        return value
+
 
 class SafetyIncident(Base):
     __tablename__ = "safety_incidents"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     report_id = Column(String(100), unique=True)
-    date = Column(Date, nullable=False, index=True)
+    date = Column(Date, nullable=False)
     manufacturer = Column(String(200), nullable=False, index=True)
     vehicle_model = Column(String(200))
     city = Column(String(200))
@@ -75,8 +178,8 @@ class SafetyIncident(Base):
     state_code = Column(String(2))
     latitude = Column(Float)
     longitude = Column(Float)
-    incident_type = Column(String(100))
-    severity = Column(String(50))
+    incident_type = Column(String(100), index=True)
+    severity = Column(String(50), index=True)
     ads_engaged = Column(Boolean)
     description = Column(Text)
     source = Column(String(200))
@@ -84,13 +187,25 @@ class SafetyIncident(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    search_columns = (report_id, manufacturer, description, city)
+
+    __table_args__ = (
+        Index("ix_safety_incidents_severity_lower", func.lower(severity)),
+        Index("ix_safety_incidents_incident_type_lower", func.lower(incident_type)),
+        # Stats by year group on the extracted year
+        Index("ix_safety_incidents_year", extract("year", date)),
+        located_index("ix_safety_incidents_location", latitude, longitude),
+        search_index("ix_safety_incidents_search", *search_columns),
+    )
+
 
 class Resource(Base):
     __tablename__ = "resources"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     title = Column(String(500), nullable=False)
-    author_org = Column(String(300), nullable=False, index=True)
+    author_org = Column(String(300), nullable=False)
     resource_type = Column(String(100), index=True)
     publication_date = Column(Date)
     tags = Column(String(500))
@@ -100,17 +215,24 @@ class Resource(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    search_columns = (title, summary, author_org)
+
+    __table_args__ = (
+        search_index("ix_resources_search", *search_columns),
+    )
+
 
 class CurbsideRegulation(Base):
     __tablename__ = "curbside_regulations"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     city = Column(String(200), nullable=False, index=True)
-    state = Column(String(100), nullable=False)
+    state = Column(String(100), nullable=False, index=True)
     state_code = Column(String(2))
     latitude = Column(Float)
     longitude = Column(Float)
-    regulation_type = Column(String(200))
+    regulation_type = Column(String(200), index=True)
     description = Column(Text)
     applies_to = Column(String(200))
     date_adopted = Column(Date)
@@ -119,16 +241,118 @@ class CurbsideRegulation(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    search_columns = (regulation_type, city, state, description)
+
+    __table_args__ = (
+        located_index("ix_curbside_regulations_location", latitude, longitude),
+        search_index("ix_curbside_regulations_search", *search_columns),
+    )
+
 
 class NewsArticle(Base):
     __tablename__ = "news_articles"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     headline = Column(String(500), nullable=False)
     source_org = Column(String(300), nullable=False)
     publication_date = Column(Date, nullable=False, index=True)
     summary = Column(Text)
     url = Column(String(1000))
-    category = Column(String(100), index=True)
+    category = Column(String(100))
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    search_columns = (headline, summary)
+    # List pages follow the feed's newest-first publication order
+    page_columns = (publication_date, id)
+
+    __table_args__ = (
+        search_index("ix_news_articles_search", *search_columns),
+        # Category pages walk this in list order and stop at the limit
+        Index(
+            "ix_news_articles_category_date",
+            category, publication_date.desc(), id.desc(),
+        ),
+    )
+
+
+# ------------------------------------------------------------------ #
+#  SQLite full-text search
+# ------------------------------------------------------------------ #
+def fts_table_name(model):
+    return f"{model.__tablename__}_fts"
+
+
+def _sqlite_search_ddl(model):
+    """Statements building an FTS5 index over ``model.search_columns``.
+
+    The external-content table stores only the index; triggers keep it in
+    step with the base table and the final ``rebuild`` indexes any rows
+    that were there before it existed.
+    """
+    table, fts = model.__tablename__, fts_table_name(model)
+    names = [col.name for col in model.search_columns]
+    cols = ", ".join(names)
+    new = ", ".join(f"new.{name}" for name in names)
+    old = ", ".join(f"old.{name}" for name in names)
+    insert_new = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});"
+    delete_old = (
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{table}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_sqlite_search_tables(metadata, connection, **kw):
+    """Add any missing FTS5 search tables after ``create_all`` on SQLite."""
+    if connection.dialect.name != "sqlite":
+        return
+    existing = set(
+        connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        ).scalars()
+    )
+    for model in (
+        Policy, Deployment, FundingProgram, SafetyIncident,
+        Resource, CurbsideRegulation, NewsArticle,
+    ):
+        if fts_table_name(model) not in existing:
+            for statement in _sqlite_search_ddl(model):
+                connection.exec_driver_sql(statement)
+
+
+# ------------------------------------------------------------------ #
+#  Upgrading existing databases
+# ------------------------------------------------------------------ #
+def upgrade_schema(connection):
+    """Add columns introduced since an existing database was created.
+
+    ``create_all`` only creates missing tables, so a database built by an
+    earlier version lacks newer columns. Run after ``create_all``.
+    """
+    funding = FundingProgram.__table__
+    columns = {col["name"] for col in inspect(connection).get_columns(funding.name)}
+    if "total_funding_amount" not in columns:
+        connection.exec_driver_sql(
+            "ALTER TABLE funding_programs ADD COLUMN total_funding_amount FLOAT"
+        )
+        rows = connection.execute(select(funding.c.id, funding.c.total_funding)).all()
+        if rows:
+            connection.execute(
+                funding.update()
+                .where(funding.c.id == bindparam("row_id"))
+                .values(total_funding_amount=bindparam("amount")),
+                [
+                    {"row_id": id, "amount": _parse_funding_amount(total)}
+                    for id, total in rows
+                ],
+            )
@@ -0,0 +1,30 @@
+"""Create the database tables and load the seed data.
+
+Run once before starting the API workers:
+
+    python seed.py
+"""
+import asyncio
+
+from sqlalchemy import select
+
+from database import engine, Base, SessionLocal
+from models import Policy, upgrade_schema
+from seed_data import seed_database
+
+
+async def main():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+    async with SessionLocal() as db:
+        if await db.scalar(select(Policy.id).limit(1)) is None:
+            await db.run_sync(seed_database)
+            print("Database ready")
+        else:
+            print("Database already seeded")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -68,7 +68,7 @@ export default function News() {
   // Fetch recent policies on mount
   useEffect(() => {
     setPoliciesLoading(true);
-    fetchPolicies({ limit: 20 })
+    fetchPolicies()
       .then((data) => {
         const items = Array.isArray(data) ? data : data.data || [];
         // Sort newest first